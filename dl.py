@@ -1,22 +1,33 @@
 import numpy as np 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os 
-import sys 
 import io
 import re 
+import threading
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime 
 from datetime import timedelta 
 import pytz 
 import time
+import requests
+from requests.adapters import HTTPAdapter
 
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 import creds
 
-if sys.version_info[0] < 3:
-    from StringIO import StringIO
-else:
-    from io import StringIO
+CSV_FILENAME_RE = re.compile(r'(?i).*[/]((.*)[.]csv)')
+CSV_STEM_RE = re.compile(r'(?i)(.*)[.]csv')
+# keep timestamps as text so every JHU era is parsed the same way in processJHUProvinceState
+JHU_COLUMN_TYPES = {'Last Update': pa.string(), 'Last_Update': pa.string()}
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# concurrent JHU daily-file transfers, for both fetching and reading back from staging
+JHU_MAX_WORKERS = 32
 
 def startDateDefault(start, dateFormat):
         return datetime.strptime(start, dateFormat).date()
@@ -27,6 +38,69 @@ def getToday():
 def endDateDefault():
     return datetime.date(getToday())
 
+def readCsvBytes(data, columnTypes=None):
+    # pyarrow's multi-threaded reader is much faster than pandas; fall back to pandas to skip malformed rows
+    try:
+        table = pacsv.read_csv(io.BytesIO(data),
+            parse_options=pacsv.ParseOptions(delimiter=','),
+            convert_options=pacsv.ConvertOptions(column_types=columnTypes or {}, strings_can_be_null=True))
+        return table.to_pandas()
+    except pa.ArrowInvalid:
+        return pd.read_csv(io.BytesIO(data), error_bad_lines=False, delimiter=',')
+
+def uploadBuffer(blob, buf, contentType):
+    # uploads from the buffer's current position back to its start; large payloads go up as a chunked
+    # resumable upload so a transient error only re-sends the failed chunk
+    size = buf.tell()
+    buf.seek(0)
+    if size > UPLOAD_CHUNK_SIZE:
+        blob.chunk_size = UPLOAD_CHUNK_SIZE
+    blob.upload_from_file(buf, content_type=contentType, size=size)
+
+def uploadCsv(blob, df):
+    # encode the CSV straight into a byte buffer instead of building the whole file as a str first
+    buf = io.BytesIO()
+    wrapper = io.TextIOWrapper(buf, encoding='utf-8', newline='')
+    df.to_csv(wrapper, index=False)
+    wrapper.flush()
+    wrapper.detach()
+    uploadBuffer(blob, buf, "text/csv")
+
+def uploadParquet(blob, df):
+    # staging files are stored as Snappy-compressed Parquet: smaller than CSV and typed on read
+    buf = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buf, compression='snappy')
+    uploadBuffer(blob, buf, "application/octet-stream")
+
+def readParquetBytes(data, categories=None):
+    # columns listed in categories are read dictionary-encoded and arrive in pandas as categoricals
+    return pq.read_table(pa.BufferReader(data), read_dictionary=categories).to_pandas()
+
+def coalesceColumns(df, cols):
+    # first non-null value across cols, in order; columns absent from df are ignored
+    cols = [col for col in cols if col in df.columns]
+    if not cols:
+        return pd.Series(np.nan, index=df.index)
+    return df[cols].bfill(axis=1).iloc[:, 0]
+
+def coalesceNonZero(df, primary, fallback):
+    # primary where it is non-zero, else fallback, as one numpy pass; nulls and absent columns count as 0
+    values = [df[col].to_numpy(dtype='float64', na_value=0.0) if col in df.columns else np.zeros(len(df)) for col in [primary, fallback]]
+    return np.where(values[0] != 0.0, values[0], values[1])
+
+_threadLocal = threading.local()
+
+def getSession(poolSize=32):
+    # one requests.Session per worker thread so TCP/TLS connections are reused across fetches
+    session = getattr(_threadLocal, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _threadLocal.session = session
+    return session
+
 class Covid19Data():
     '''
     Data Sources: 
@@ -71,47 +145,98 @@ class Covid19Data():
         # ["CovidTracking"]["StateCurrent"] = "https://covidtracking.com/api/v1/states/current.csv"
         # ["CovidTracking"]["CountryCurrent"] = "https://covidtracking.com/api/v1/us/current.csv",
         # ["DXY-Covid-19"]["News"] = "https://raw.githubusercontent.com/BlankerL/DXY-COVID-19-Data/master/csv/DXYNews.csv"
+
+    # staging columns read straight into categoricals (only where they are not used as groupby keys)
+    stagingCategories = {
+        ("NyTimes", "County"): ['county', 'state'],
+        ("CovidTracking", "StateHistorical"): ['state']
+    }
+
+    # timestamp columns staged as text, so pass-through values reach the target CSV unchanged
+    # (pyarrow would otherwise infer timestamps and re-format them on the way out)
+    stagingTextColumns = {
+        ("NyTimes", "County"): ['date'],
+        ("CovidTracking", "StateHistorical"): ['lastUpdateEt', 'dateModified', 'checkTimeEt', 'dateChecked'],
+        ("CovidTracking", "CountryHistorical"): ['lastModified', 'dateChecked'],
+        ("DxyCovid19", "Region"): ['updateTime'],
+        ("DxyCovid19", "Country"): ['updateTime']
+    }
     
     def __init__(self, startDate=endDateDefault()-timedelta(days=10), endDate=endDateDefault(), currentDate=None):
         # startDateDefault('01/22/2020', '%m/%d/%Y')
         self.startDate = startDate
         self.endDate = endDate
         self.currentDate = startDate
+        self._storage = None
+        self.handlers = {
+            ('NyTimes', 'County'): self.processNyTimesCounty,
+            ('CovidTracking', 'StateHistorical'): self.processCovidTrackingStateHistorical,
+            ('CovidTracking', 'CountryHistorical'): self.processCovidTrackingCountryHistorical,
+            ('DxyCovid19', 'Region'): self.processDxyCovid19Region,
+            ('DxyCovid19', 'Country'): self.processDxyCovid19Country,
+            ('JHU', 'ProvinceState'): self.processJHUProvinceState
+        }
 
-    def getFilename(self, key, url, regex=r'(?i).*[/]((.*)[.]csv)', group=1, desc=''):
-        reg = re.match(r'(?i).*[/]((.*)[.]csv)', url)
+    @property
+    def storage(self):
+        # the GCS client is created once per instance so its auth token and connection pool are shared by every blob operation
+        if self._storage is None:
+            client, bucket_name, staging, target, archive, log = creds.storageClient()
+            adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64)
+            client._http.mount('https://', adapter)
+
+            bucket = client.bucket(bucket_name)
+            bucket.versioning_enabled = False
+            self._storage = (client, bucket, staging, target, archive, log)
+        return self._storage
+
+    def getFilename(self, key, url, regex=CSV_FILENAME_RE, group=1, desc='', extension=None):
+        reg = regex.match(url)
         filename = key.lower() \
             + (('-' + desc) if desc else '') \
-            + '-' + reg.group(1)
+            + '-' + (reg.group(group) if extension is None else '%s.%s' % (os.path.splitext(reg.group(group))[0], extension))
         return filename
     
-    def getStagingBlob_andArchiveCurrentTarget(self, bucket, folderStaging, folderTarget, folderArchive, filename, getStaging=True, getTarget=True):
+    def getStagingBlob_andArchiveCurrentTarget(self, bucket, folderStaging, folderTarget, folderArchive, filename, getStaging=True, getTarget=True, stagingFilename=None, categories=None):
         # create blobs
-        blobStaging = bucket.blob(folderStaging + filename)
+        if stagingFilename is None:
+            stagingFilename = filename
+        blobStaging = bucket.blob(folderStaging + stagingFilename)
+        blobStagingLegacy = bucket.blob(folderStaging + filename)
         blobTarget = bucket.blob(folderTarget + filename)
 
-        archiveFilename = re.match(r'(?i)(.*)[.]csv', filename).group(1)
+        archiveFilename = CSV_STEM_RE.match(filename).group(1)
         date = datetime.today().strftime("%Y%m%d")
         archiveFilename = '%s-%s.csv' % (archiveFilename, date)
-        blobArchive = bucket.blob(folderArchive + archiveFilename)
 
         # retrive file from staging and convert to Dataframe
         df = pd.DataFrame([])
         if getStaging:
-            downloadStaging = blobStaging.download_as_string()
-            print("Retrieved file from staging: %s" % filename)
+            # chunk_size is left unset so the blob comes back in one request; raw_download skips gzip decoding
+            try:
+                downloadStaging = blobStaging.download_as_string(raw_download=True)
+            except NotFound as e:
+                if stagingFilename == filename:
+                    raise
+                # files staged before the switch to Parquet only exist as CSV; any other error propagates
+                print("Staging file not found, trying CSV: %s" % stagingFilename)
+                print("ERROR: %s" % e)
+                stagingFilename = filename
+                downloadStaging = blobStagingLegacy.download_as_string(raw_download=True)
+            print("Retrieved file from staging: %s" % stagingFilename)
 
-            downloadStaging = StringIO(str(downloadStaging, "utf-8"))
-            df = pd.read_csv(downloadStaging, delimiter=",")
+            if stagingFilename.endswith('.parquet'):
+                df = readParquetBytes(downloadStaging, categories=categories)
+            else:
+                df = pd.read_csv(io.BytesIO(downloadStaging), error_bad_lines=False, delimiter=",")
 
         if getTarget:
-            # retrieve/archive current file in target
+            # archive current file in target with a server-side copy (no download/upload round-trip)
             try:
-                downloadTarget = blobTarget.download_as_string()
-                blobArchive.upload_from_string(downloadTarget, content_type="text/csv")
+                bucket.copy_blob(blobTarget, bucket, folderArchive + archiveFilename)
                 print("Target file archived: %s > %s" % (filename, archiveFilename))
 
-                del [blobArchive, archiveFilename, date, downloadTarget]
+                del [archiveFilename, date]
             except Exception as e:
                 print("Archival Skipped. Target file does not exist: %s\n" % filename)
                 print("ERROR: %s" % e)
@@ -119,66 +244,91 @@ class Covid19Data():
         return df, blobTarget
 
     def getData(self, source=None, level=None):
-        client, bucket_name, staging, target, archive, log = creds.storageClient()
-        bucket = client.bucket(bucket_name)
-        bucket.versioning_enabled = False
-
-        for k in self.sources:
-            if k == "JHU":
-                self.getJhuData(bucket, staging, self.sources[k]["ProvinceState"], self.startDate, self.endDate)
-            else: 
-                for j in self.sources[k]:
-                    try: 
-                        # fetch CSV
-                        url = self.sources[k][j]
-                        df = pd.read_csv(url, error_bad_lines=False, delimiter=',')
-                        print("Fetched file for %s - %s" % (k, j))
-
-                        # push to GCS
-                        df = df.to_csv(index=False)
-                        filename = self.getFilename(k, url, desc=j)
-
-                        blob = bucket.blob(staging + filename)
-                        blob.upload_from_string(df, content_type="text/csv")
-                        print("Pushed file for %s - %s to GCS" % (k, j))
-                    except Exception as e:
-                        print("ERROR: failed to fetch/push %s - %s" % (k, j))
-                        print(e)
+        client, bucket, staging, target, archive, log = self.storage
+
+        # sources are independent downloads, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
+            futures = [executor.submit(self.getSourceData, bucket, staging, k) for k in self.sources]
+            for future in futures:
+                future.result()
+
+    def getSourceData(self, bucket, staging, k):
+        if k == "JHU":
+            self.getJhuData(bucket, staging, self.sources[k]["ProvinceState"], self.startDate, self.endDate)
+            return
+
+        for j in self.sources[k]:
+            try: 
+                # fetch CSV
+                url = self.sources[k][j]
+                resp = getSession().get(url, timeout=60)
+                resp.raise_for_status()
+                print("Fetched file for %s - %s" % (k, j))
+
+                # push to GCS as Parquet
+                filename = self.getFilename(k, url, desc=j, extension='parquet')
+
+                blob = bucket.blob(staging + filename)
+                columnTypes = {col: pa.string() for col in self.stagingTextColumns.get((k, j), [])}
+                uploadParquet(blob, readCsvBytes(resp.content, columnTypes=columnTypes))
+                print("Pushed file for %s - %s to GCS" % (k, j))
+            except Exception as e:
+                print("ERROR: failed to fetch/push %s - %s" % (k, j))
+                print(e)
     
-    def getJhuData(self, bucket, folder, baseURL, startDate=None, endDate=None, currentDate=None):
+    def getJhuData(self, bucket, folder, baseURL, startDate=None, endDate=None, currentDate=None, maxWorkers=JHU_MAX_WORKERS):
         if startDate == None:
             startDate = self.startDate
         if endDate == None:
             endDate = self.endDate
         if currentDate == None:
             currentDate = self.currentDate
+
+        jobs = []
         while currentDate <= endDate:
             currentDateStr = currentDate.strftime('%m-%d-%Y')
-            url = baseURL + currentDateStr + '.csv'
-            try:
-                # fetch CSV
-                df = pd.read_csv(url, error_bad_lines=False, delimiter=',')
-                print("Fetched file for JHU - %s" % currentDateStr)
+            jobs.append((currentDateStr, baseURL + currentDateStr + '.csv'))
+            currentDate = currentDate + timedelta(days=1)
+
+        def fetchAndPush(currentDateStr, url):
+            # fetch CSV
+            resp = getSession().get(url, timeout=30)
+            resp.raise_for_status()
+            print("Fetched file for JHU - %s" % currentDateStr)
+
+            # push to GCS as Parquet
+            filename = "jhu-" + currentDateStr + '.parquet'
+            blob = bucket.blob(folder + filename)
+            uploadParquet(blob, readCsvBytes(resp.content, columnTypes=JHU_COLUMN_TYPES))
+            print("Pushed file for JHU - %s to GCS" % currentDateStr)
+
+        # daily files are latency-bound, so fetch them all concurrently
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futures = {executor.submit(fetchAndPush, d, url): d for d, url in jobs}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print("ERROR: failed to fetch/push JHU - %s" % futures[future])
+                    print(e)
 
-                # push to GCS
-                df = df.to_csv(index=False)
-                filename = "jhu-" + currentDateStr + '.csv'
+    def processData(self, fetch=False):
+        """Processes every source from staging into target.
 
-                blob = bucket.blob(folder + filename)
-                blob.upload_from_string(df, content_type="text/csv")
-                print("Pushed file for JHU - %s to GCS" % currentDateStr)
-            except Exception as e:
-                print(e)
-            finally:
-                currentDate = currentDate + timedelta(days=1)
+        If fetch is True, sources are also fetched into staging first: downloads run on background threads and each source is processed as soon as its fetch completes, overlapping network waits with pandas work.
+        """
+        client, bucket, staging, target, archive, log = self.storage
 
-    def processData(self):
-        client, bucket_name, staging, target, archive, log = creds.storageClient()
-        bucket = client.bucket(bucket_name)
-        bucket.versioning_enabled = False
+        if not fetch:
+            for k in self.sources:
+                self.process(source=k, bucket=bucket, staging=staging, target=target, archive=archive)
+            return
 
-        for k in self.sources:
-            self.process(source=k, bucket=bucket, staging=staging, target=target, archive=archive)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {executor.submit(self.getSourceData, bucket, staging, k): k for k in self.sources}
+            for future in as_completed(futures):
+                future.result()
+                self.process(source=futures[future], bucket=bucket, staging=staging, target=target, archive=archive)
     
     def process(self, **kwargs):
         """Retrieves current file from staging, archives, existing target files, processes staging file and pushes it to the target folder. 
@@ -203,43 +353,71 @@ class Covid19Data():
             
             df, blobTarget = self.getStagingBlob_andArchiveCurrentTarget(kwargs['bucket'], kwargs['staging'], kwargs['target'], kwargs['archive'], filename, getStaging=False)
 
-            currentDate = startDate
-            while currentDate <= endDate:
-                currentDateStr = currentDate.strftime('%m-%d-%Y')
-                print("attempting current date = %s" % currentDateStr)
-                blobStaging = kwargs['bucket'].blob(kwargs['staging'] + \
-                    '%s-%s.csv' % (source.lower(), currentDateStr))
-                print('created blob: %s' % currentDateStr)
-                
-                downloadedFile = ''
-                try:
-                    downloadedFile = str(blobStaging.download_as_string(), encoding="utf-8")
-                    print('downloaded file: %s' % currentDateStr)
-                except Exception as e:
-                    print("ERROR: file not found - %s" % currentDateStr)
-                    print(e)
+            dates = [startDate + timedelta(days=i) for i in range((endDate - startDate).days + 1)]
 
-                if len(downloadedFile) == 0:
-                    currentDate = currentDate + timedelta(days=1)
-                    print("Empty file: %s" % currentDateStr)
-                    continue
-
-                csvFile = StringIO(downloadedFile)
-                tempDf = pd.read_csv(csvFile, delimiter=",")
-                print("Converted download to DF - %s" % currentDateStr)
-                
-                df = df.append(tempDf)
-                print("Appended file to DF: %s" % currentDateStr)
-                currentDate = currentDate + timedelta(days=1)
-
-            # process combined df object
-            f = eval('self.process%s%s' % (source, 'ProvinceState'))
-            df = f(df)
-            print("Finish processing data: %s" % filename)
+            def downloadStaging(currentDate):
+                # days staged before the switch to Parquet only exist as CSV
+                currentDateStr = currentDate.strftime('%m-%d-%Y')
+                for extension in ['parquet', 'csv']:
+                    blobStaging = kwargs['bucket'].blob(kwargs['staging'] + \
+                        '%s-%s.%s' % (source.lower(), currentDateStr, extension))
+                    try:
+                        downloadedFile = blobStaging.download_as_string(raw_download=True)
+                        print('downloaded file: %s' % currentDateStr)
+                        return extension, downloadedFile
+                    except NotFound as e:
+                        error = e
+                    except Exception as e:
+                        print("ERROR: failed to download staging file - %s.%s" % (currentDateStr, extension))
+                        print(e)
+                        return None, b''
+                print("ERROR: file not found - %s" % currentDateStr)
+                print(error)
+                return None, b''
+
+            frames = []
+
+            # staging holds one small file per day, so download them concurrently; each day is processed as soon as
+            # it arrives (in date order) and only the slim processed frame is kept. At most 2 * maxWorkers downloads
+            # are in flight, so raw payloads cannot pile up while the calling thread is busy processing.
+            maxWorkers = JHU_MAX_WORKERS
+            pendingDates = iter(dates)
+            inFlight = deque()
+            with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+                for currentDate in pendingDates:
+                    inFlight.append((currentDate, executor.submit(downloadStaging, currentDate)))
+                    if len(inFlight) >= 2 * maxWorkers:
+                        break
+
+                while inFlight:
+                    currentDate, future = inFlight.popleft()
+                    extension, downloadedFile = future.result()
+                    nextDate = next(pendingDates, None)
+                    if nextDate is not None:
+                        inFlight.append((nextDate, executor.submit(downloadStaging, nextDate)))
+
+                    currentDateStr = currentDate.strftime('%m-%d-%Y')
+                    if extension is None:
+                        # missing or failed download, already logged by downloadStaging
+                        continue
+                    if len(downloadedFile) == 0:
+                        print("Empty file: %s" % currentDateStr)
+                        continue
+
+                    if extension == 'parquet':
+                        dayDf = readParquetBytes(downloadedFile)
+                    else:
+                        dayDf = readCsvBytes(downloadedFile, columnTypes=JHU_COLUMN_TYPES)
+                    frames.append(self.processJHUProvinceStateDay(dayDf))
+                    print("Processed file - %s" % currentDateStr)
+
+            # combine all processed days in one pass
+            df = pd.concat(frames, ignore_index=True, copy=False) if frames else pd.DataFrame([])
+            df = self.categorizeJHUProvinceState(df)
+            print("Finish processing data: %s (%d files)" % (filename, len(frames)))
 
             # push processed df to target
-            df = df.to_csv(index=False)
-            blobTarget.upload_from_string(df, content_type="text/csv")
+            uploadCsv(blobTarget, df)
             print("Pushed file to Target: %s" % filename)
 
             return
@@ -248,81 +426,83 @@ class Covid19Data():
             # get filenames
             filename = self.getFilename(kwargs['source'], self.sources[kwargs['source']][key], desc=key)
 
+            stagingFilename = self.getFilename(kwargs['source'], self.sources[kwargs['source']][key], desc=key, extension='parquet')
+
             # retrieve files from staging, archive existing target files
-            df, blobTarget = self.getStagingBlob_andArchiveCurrentTarget(kwargs['bucket'], kwargs['staging'], kwargs['target'], kwargs['archive'], filename)
+            df, blobTarget = self.getStagingBlob_andArchiveCurrentTarget(kwargs['bucket'], kwargs['staging'], kwargs['target'], kwargs['archive'], filename, stagingFilename=stagingFilename, \
+                categories=self.stagingCategories.get((kwargs['source'], key)))
 
             # process staging file
-            f = eval('self.process%s%s' % (kwargs['source'], key))
+            f = self.handlers[(kwargs['source'], key)]
             df = f(df)
             print("Finish processing data: %s" % filename)
 
             # push to target
-            df = df.to_csv(index=False)
-            blobTarget.upload_from_string(df, content_type="text/csv")
+            uploadCsv(blobTarget, df)
             print("Pushed file to Target: %s" % filename)
     
     def processNyTimesCounty(self, df):
         return df
 
     def processJHUProvinceState(self, df):
+        return self.categorizeJHUProvinceState(self.processJHUProvinceStateDay(df))
+
+    def processJHUProvinceStateDay(self, df):
+        """Processes one or more JHU daily reports into the target columns, without the categorical casts so that
+        frames from different days can be concatenated cheaply."""
+        # drop columns that are never used before doing any work on the frame
+        colsUnused = ['FIPS', 'Unnamed: 0', 'Combined_Key', 'updateLength']
+        df = df.drop(columns=colsUnused, errors='ignore')
+
         # rename columns
         df.rename(columns = {
             "Admin2": 'US_County'
         }, inplace=True)
 
         # combine duplicate columns
-        df['LastUpdate'] = df.apply(lambda row: row['Last Update'] if type(row['Last Update']) == str else row['Last_Update'], axis=1)
-        df['CountryRegion'] = df.apply(lambda row: row['Country/Region'] if type(row['Country/Region']) == str else row['Country_Region'], axis=1)
-        df['StateProvince'] = df.apply(lambda row: row['Province/State'] if type(row['Province/State']) == str else row['Province_State'], axis=1)
-
-        # fix Lat/Long columns and combine
-        df.Lat = df.Lat.fillna(0)
-        df.Latitude = df.Latitude.fillna(0)
-        df.Long_ = df.Long_.fillna(0)
-        df.Longitude = df.Longitude.fillna(0)
-        df['Latitude'] = df.apply(lambda row: row['Lat'] if row['Lat'] != 0 else row['Latitude'], axis=1)
-        df['Longitude'] = df.apply(lambda row: row['Long_'] if row['Long_'] != 0 else row['Longitude'], axis=1)
+        df['CountryRegion'] = coalesceColumns(df, ['Country/Region', 'Country_Region'])
+
+        # remove China from dataset (using another data source for China) before any further work on those rows
+        df = df[df.CountryRegion.isin(['China', 'Mainland China']) == False].copy()
+
+        lastUpdate = coalesceColumns(df, ['Last Update', 'Last_Update'])
+        df['StateProvince'] = coalesceColumns(df, ['Province/State', 'Province_State'])
+
+        # fix Lat/Long columns and combine (0 is treated as missing)
+        df['Latitude'] = coalesceNonZero(df, 'Lat', 'Latitude')
+        df['Longitude'] = coalesceNonZero(df, 'Long_', 'Longitude')
+
+        # delete the source columns that were combined above
+        colsCombined = ['Last_Update', 'Last Update', 'Country/Region', 'Country_Region', 'Long_', 'Lat', 'Province/State', 'Province_State']
+        df = df.drop(columns=colsCombined, errors='ignore')
 
         # convert String date columns and combine
-        def convertLastUpdate(df): 
-            reg_mmddyyHHMM = r'^[0-9]{1,2}[/][0-9]{1,2}[/][0-9]{2} [0-9]{1,2}:[0-9]{1,2}$'
-            reg_mmddyyyyHHMM = r'^[0-9]{1,2}[/][0-9]{1,2}[/][0-9]{4} [0-9]{1,2}:[0-9]{1,2}$'
-            reg_yyyymmddTHHMMSS = r'^[0-9]{4}[-][0-9]{1,2}[-][0-9]{1,2}T[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}$'
-            reg_yyyy_mm_dd_HHMMSS = r'^[0-9]{4}[-][0-9]{1,2}[-][0-9]{1,2} [0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}$'
-
-            mmddyyyyHHMM = '%m/%d/%Y %H:%M'
-            mmddyyHHMM = '%m/%d/%y %H:%M'
-            yyyymmddTHHMMSS = '%Y-%m-%dT%H:%M:%S'
-            yyyy_mm_dd_HHMMSS = '%Y-%m-%d %H:%M:%S'
-
-            if re.match(reg_mmddyyHHMM, df.LastUpdate):
-                return datetime.strptime(df.LastUpdate, mmddyyHHMM)
-            elif re.match(reg_mmddyyyyHHMM , df.LastUpdate):
-                return datetime.strptime(df.LastUpdate, mmddyyyyHHMM)
-            elif re.match(reg_yyyymmddTHHMMSS , df.LastUpdate):
-                return datetime.strptime(df.LastUpdate, yyyymmddTHHMMSS)
-            elif re.match(reg_yyyy_mm_dd_HHMMSS, df.LastUpdate):
-                return datetime.strptime(df.LastUpdate, yyyy_mm_dd_HHMMSS)
-            else:
-                return None
-        df['LastUpdateDatetime'] = df.apply(convertLastUpdate, axis=1)
+        # JHU changed its timestamp format several times; parse each format vectorized, filling only rows still unparsed
+        lastUpdateFormats = [
+            '%m/%d/%y %H:%M',
+            '%m/%d/%Y %H:%M',
+            '%Y-%m-%dT%H:%M:%S',
+            '%Y-%m-%d %H:%M:%S'
+        ]
+        lastUpdateDatetime = pd.to_datetime(lastUpdate, format=lastUpdateFormats[0], errors='coerce')
+        for fmt in lastUpdateFormats[1:]:
+            unparsed = lastUpdateDatetime.isna()
+            if not unparsed.any():
+                break
+            lastUpdateDatetime[unparsed] = pd.to_datetime(lastUpdate[unparsed], format=fmt, errors='coerce')
+        df['LastUpdateDatetime'] = lastUpdateDatetime
         df['LastUpdateDate'] = df.LastUpdateDatetime.dt.date
 
-        # delete unnecessary columns
-        colsToDelete = ['Last_Update', 'Last Update', 'FIPS', 'Country/Region', 'Country_Region', 'Unnamed: 0', 'Long_', 'Lat', 'Province/State', 'Province_State', 'LastUpdate', 'Combined_Key', 'updateLength']
-        for col in colsToDelete:
-            try:
-                df = df.drop([col], axis=1)
-            except:
-                pass
-        
+        return df
+
+    def categorizeJHUProvinceState(self, df):
+        # combined columns go last, after the pass-through JHU columns
+        colsCombined = ['CountryRegion', 'StateProvince', 'LastUpdateDatetime', 'LastUpdateDate']
+        df = df[[col for col in df.columns if col not in colsCombined] + [col for col in colsCombined if col in df.columns]]
+
         # set categorical columns
         colsCategory = ['Latitude', 'Longitude', 'US_County', 'StateProvince', 'CountryRegion', 'LastUpdateDatetime', 'LastUpdateDate']
-        for col in colsCategory:
-            df[col] = df[col].astype('category')
-
-        # remove China from dataset (using another data source for China)
-        df = df[df.CountryRegion.isin(['China', 'Mainland China']) == False]
+        df = df.astype({col: 'category' for col in colsCategory if col in df.columns})
 
         return df
 
@@ -330,16 +510,14 @@ class Covid19Data():
         colsToDrop = ['hash', 'posNeg', 'fips', 'dateChecked']
         df = df.drop(colsToDrop, axis=1)
         df['date'] = pd.to_datetime(df.date, format='%Y%m%d').dt.date
-        for col in ['date', 'state']:
-            df[col] = df[col].astype('category')
+        df = df.astype({'date': 'category', 'state': 'category'})
         return df
     
     def processCovidTrackingCountryHistorical(self, df):
         colsToDrop = ['hash', 'posNeg', 'fips', 'dateChecked', 'states']
         df = df.drop(colsToDrop, axis=1)
         df['date'] = pd.to_datetime(df.date, format='%Y%m%d').dt.date
-        for col in ['date']:
-            df[col] = df[col].astype('category')
+        df = df.astype({'date': 'category'})
         return df
 
     def processDxyCovid19Country(self, df):
@@ -352,18 +530,17 @@ class Covid19Data():
             'deadCount': 'death', 
             'seriousCount': 'serious'
         }, inplace=True)
-        df['date'] = pd.to_datetime(df.updateTime, format='%Y-%m-%d %H:%M:%S').dt.date
+        updateTime = pd.to_datetime(df.updateTime, format='%Y-%m-%d %H:%M:%S')
+        df['date'] = updateTime.dt.date
 
-        for col in ['updateTime', 'date']:
-            df[col] = df[col].astype('category').cat.as_ordered()
+        # keep the latest update of each day
+        df = df.loc[updateTime.sort_values(kind='mergesort').index]\
+            .drop_duplicates(['date'], keep='last')\
+            .sort_values('date')\
+            [['date', 'confirmed', 'suspected', 'recovered', 'death', 'serious']]\
+            .reset_index(drop=True)
 
-        def chooseLatestRow(df):
-            return df[df.updateTime == df.updateTime.max()]
-        
-        df = df.groupby(['date']).apply(chooseLatestRow)
-        df = df[['confirmed', 'suspected', 'recovered', 'death', 'serious']]\
-            .reset_index()\
-            [['date', 'confirmed', 'suspected', 'recovered', 'death', 'serious']]
+        df = df.astype({'date': pd.CategoricalDtype(ordered=True)})
 
         return df
 
@@ -377,26 +554,21 @@ class Covid19Data():
         }, inplace=True)
         df['date'] = pd.to_datetime(df.updateTime, format='%Y-%m-%d %H:%M:%S').dt.date
         validCountries = ['China']
-        df = df[(df.country.isin(validCountries))].groupby(['continent', 'country', 'province', 'province_zipCode', 'date', 'updateTime']).agg({
-            'province_confirmedCount': 'max',
-            'province_suspectedCount': 'max',
-            'province_curedCount': 'max',
-            'province_deadCount': 'max'
-        }).reset_index().groupby(['continent', 'country', 'province', 'date', 'updateTime']).agg({
-            'province_confirmedCount': 'sum',
-            'province_suspectedCount': 'sum',
-            'province_curedCount': 'sum',
-            'province_deadCount': 'sum'
-        }).reset_index().copy()
-
-        for col in ['continent', 'country', 'province', 'date', 'updateTime']:
-            df[col] = df[col].astype('category')
-
-        df = df[df.province != 'China'].groupby(['continent', 'country', 'province', 'date']).agg({
-            'province_confirmedCount': 'max',
-            'province_suspectedCount': 'max',
-            'province_curedCount': 'max',
-            'province_deadCount': 'max'
-        }).ffill().groupby(['continent', 'country', 'province', 'date']).cummax().reset_index()
+        countCols = ['province_confirmedCount', 'province_suspectedCount', 'province_curedCount', 'province_deadCount']
+        provinceKeys = ['continent', 'country', 'province', 'date', 'updateTime']
+
+        # max over duplicated city rows per zip code, then sum zip codes per province, without materializing in between
+        df = df[(df.country.isin(validCountries))]\
+            .groupby(provinceKeys + ['province_zipCode'], sort=False)[countCols].max()\
+            .groupby(level=provinceKeys, sort=False).sum()\
+            .reset_index()
+
+        df = df.astype({col: 'category' for col in ['continent', 'country', 'province', 'date']})
+
+        # observed=False expands to every province x date, so missing days are forward filled from the previous day
+        df = df[df.province != 'China']\
+            .groupby(['continent', 'country', 'province', 'date'], observed=False)[countCols].max()\
+            .ffill()\
+            .reset_index()
 
         return df
@@ -2,6 +2,4 @@ import dl
 
 def updateFlow(request):
     data = dl.Covid19Data() 
-    data.getData()
-    data.processData()
-
+    data.processData(fetch=True)